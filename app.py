@@ -1,6 +1,16 @@
 
+import os
 import dash
+import flask
+import shared_data
 external_stylesheets = [] # ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 app = dash.Dash(__name__, url_base_pathname='/')
 server = app.server
 app.config.suppress_callback_exceptions = True
+
+# resident memory of whichever worker answers; exposes pids and memory layout,
+# so only served when HOP_MEMORY_ENDPOINT=1 (ops/debugging)
+if os.environ.get("HOP_MEMORY_ENDPOINT", "0") == "1":
+    @server.route('/_worker-memory')
+    def worker_memory():
+        return flask.jsonify(shared_data.memoryUsage())
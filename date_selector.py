@@ -1,17 +1,11 @@
 
-import gripql
-import datetime
 import dash_core_components as dcc
 import dash_html_components as html
 from app import app
 import dash
+import shared_data
 
-conn = gripql.Connection("http://localhost:8201")
-G = conn.graph("covid")
-
-q = G.query().V().hasLabel("SummaryLocation").has(gripql.eq("province_state", "OR")).as_("a")
-q = q.out("summary_reports").distinct("date").render("date")
-dates = sorted(list( datetime.datetime.strptime(d, "%Y-%m-%d %H:%M:%S") for d in q ))
+dates = shared_data.reportDates()
 labels = list( d.strftime("%Y-%m-%d") for d in dates  )
 marks = {}
 keys = {}
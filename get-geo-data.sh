@@ -1,3 +1,4 @@
 #!/bin/bash
 
 curl -O https://raw.githubusercontent.com/plotly/datasets/master/geojson-counties-fips.json
+python shared_data.py --filter-geojson
@@ -0,0 +1,56 @@
+# gunicorn -c gunicorn.conf.py index:server
+#
+# With preload_app the master imports index.py, so the county data, geojson
+# and layouts in shared_data / the panel modules are built once and inherited
+# copy-on-write by every worker. Set HOP_PRELOAD=0 to have each worker load
+# its own copy instead.
+#
+# Preloading also turns on HOP_SNAPSHOT unless it is set: the county callbacks
+# are answered from the data loaded at startup instead of querying GripQL, so
+# reports added to GripQL afterwards do not show up until gunicorn is
+# restarted (a HUP does not reload a preloaded app). Set HOP_SNAPSHOT=0 to
+# keep querying GripQL on every request.
+#
+# Each worker logs its memory every HOP_MEMORY_INTERVAL seconds (0 to
+# disable) and on exit. The sum of 'pss' over the master and workers is what
+# the whole deployment actually costs the node.
+
+import os
+import time
+import threading
+import shared_data
+
+bind = os.environ.get("HOP_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("HOP_WORKERS", "4"))
+preload_app = os.environ.get("HOP_PRELOAD", "1") != "0"
+memory_interval = float(os.environ.get("HOP_MEMORY_INTERVAL", "60"))
+
+if preload_app:
+    os.environ.setdefault("HOP_SNAPSHOT", "1")
+
+
+def _formatMemory(m):
+    return " ".join( "%s=%s" % (k, m[k]) for k in ("pid", "rss", "pss", "shared", "private", "maxrss") if k in m )
+
+
+def _memoryReporter(worker):
+    while True:
+        time.sleep(memory_interval)
+        worker.log.info("worker memory (kB): %s", _formatMemory(shared_data.memoryUsage()))
+
+
+def when_ready(server):
+    if preload_app:
+        shared_data.freeze()
+    server.log.info("master memory (kB): %s", _formatMemory(shared_data.memoryUsage()))
+
+
+def post_worker_init(worker):
+    # runs in the worker, so the master itself never has threads to fork with
+    if memory_interval > 0:
+        threading.Thread(target=_memoryReporter, args=(worker,), daemon=True).start()
+
+
+def worker_exit(server, worker):
+    # last reading of a worker that has been serving requests
+    worker.log.info("exiting worker memory (kB): %s", _formatMemory(shared_data.memoryUsage()))
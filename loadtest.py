@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+
+# Replays concurrent dashboard sessions against the Dash callback endpoint and
+# reports throughput, latency percentiles and error rate per concurrency level.
+#
+# By default the app is started in a separate process on synthetic county data
+# (HOP_SYNTHETIC_COUNTIES, see shared_data.getGraph), on a threaded werkzeug
+# server or, with --workers, under gunicorn -c gunicorn.conf.py:
+#
+#   python loadtest.py --concurrency 1,2,4,8,16,32 --duration 20
+#   python loadtest.py --workers 4
+#
+# Use --url to drive an already running deployment instead.
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import argparse
+import threading
+import subprocess
+import urllib.request
+from synthetic_graph import OREGON_FIPS
+
+UPDATE_PATH = "/_dash-update-component"
+DEPENDENCIES_PATH = "/_dash-dependencies"
+
+# Callback dependencies of each tab, mirroring app.callback_map:
+# (output, [inputs]) as "id.property". checkDependencies() aborts the run if
+# the app's no longer match.
+TAB_CALLBACK = ("tabs-example-content.children", ["tabs-example.value"])
+
+ONOFF_CALLBACKS = [
+    ("lockdown-slider-output-container.children", ["lockdown-slider.value"]),
+    ("rw-slider-output-container.children", ["rw-slider.value"]),
+    ("rl-slider-output-container.children", ["rl-slider.value"]),
+    ("Graph1.figure", ["infection-start.value", "incubation-days.value", "infectious-days.value",
+                       "rw-slider.value", "rl-slider.value", "lockdown-slider.value"])
+]
+
+OPTIMIZE_CALLBACKS = [
+    ("county-data.data", ["opt-county-dropdown.value"]),
+    ("model-data.data", ["opt-r-value.value", "opt-infection-start.value", "opt-incubation-days.value",
+                         "opt-infectious-days.value", "opt-offset-days.value", "opt-length-days.value"]),
+    ("optimize-graph.figure", ["county-data.data", "model-data.data", "opt-offset-days.value"]),
+    ("county-population-text.children", ["county-data.data"]),
+    ("county-infection-text.children", ["opt-infection-start.value", "county-data.data"])
+]
+
+
+class Client:
+    """
+    Posts callback requests the way the Dash renderer does, recording the
+    latency and outcome of each one
+    """
+    def __init__(self, url, timeout, results):
+        self.url = url.rstrip("/") + UPDATE_PATH
+        self.timeout = timeout
+        self.results = results
+
+    def call(self, output, inputs, changed):
+        """
+        @output: "id.property" to update
+        @inputs: list of ("id.property", value), in callback argument order
+        @changed: set of "id.property" that triggered the callback
+        Returns the new value of the output, or None on error or no update.
+        A request counts as failed if it errors or its response is not valid.
+        """
+        outputId, outputProp = output.split(".")
+        body = json.dumps({
+            "output" : output,
+            "outputs" : {"id" : outputId, "property" : outputProp},
+            "inputs" : list( dict(zip(("id", "property"), k.split(".")), value=v) for k, v in inputs ),
+            "changedPropIds" : list( k for k, v in inputs if k in changed ),
+            "state" : []
+        }).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type" : "application/json"})
+        start = time.time()
+        ok, value = False, None
+        try:
+            # urlopen raises HTTPError for 4xx/5xx
+            with urllib.request.urlopen(req, timeout=self.timeout) as res:
+                payload = res.read()
+            if payload:
+                value = responseValue(json.loads(payload.decode("utf-8")), outputId, outputProp)
+            ok = True
+        except Exception:
+            value = None
+        self.results.append((output, time.time() - start, ok))
+        return value
+
+
+def responseValue(payload, outputId, outputProp):
+    res = payload.get("response", {})
+    if "props" in res:
+        # dash <= 1.10: {"response": {"props": {prop: value}}}
+        return res["props"].get(outputProp)
+    return res.get(outputId, {}).get(outputProp)
+
+
+def checkDependencies(url):
+    """
+    Exit if the app's callbacks, from /_dash-dependencies, differ from the
+    tables above
+    """
+    with urllib.request.urlopen(url.rstrip("/") + DEPENDENCIES_PATH, timeout=30) as res:
+        deps = json.loads(res.read().decode("utf-8"))
+    app = set(
+        (d["output"], tuple( "%s.%s" % (i["id"], i["property"]) for i in d["inputs"] ))
+        for d in deps
+    )
+    table = set( (out, tuple(inputs)) for out, inputs in [TAB_CALLBACK] + ONOFF_CALLBACKS + OPTIMIZE_CALLBACKS )
+    if app != table:
+        lines = ["Callback tables in loadtest.py do not match the app:"]
+        lines += list( "  missing from app: %s <- %s" % (o, ", ".join(i)) for o, i in sorted(table - app) )
+        lines += list( "  not in tables:    %s <- %s" % (o, ", ".join(i)) for o, i in sorted(app - table) )
+        sys.exit("\n".join(lines))
+
+
+def findComponent(tree, componentId):
+    if isinstance(tree, list):
+        for c in tree:
+            found = findComponent(c, componentId)
+            if found is not None:
+                return found
+    elif isinstance(tree, dict):
+        props = tree.get("props", {})
+        if props.get("id") == componentId:
+            return props
+        return findComponent(props.get("children"), componentId)
+    return None
+
+
+class Page:
+    """
+    Property values of a rendered tab, firing its callbacks the way the
+    renderer does: each affected callback once, after any callback whose
+    output it takes as an input
+    """
+    def __init__(self, client, callbacks, values):
+        self.client = client
+        self.callbacks = callbacks
+        self.values = dict(values)
+
+    def load(self):
+        """
+        Initial call of every callback in the tab
+        """
+        outputs = set( out for out, inputs in self.callbacks )
+        self._fire(set( i for out, inputs in self.callbacks for i in inputs if i not in outputs ))
+
+    def set(self, props):
+        """
+        A user edit, eg page.set({"rw-slider.value" : 2.5})
+        """
+        self.values.update(props)
+        self._fire(set(props))
+
+    def _fire(self, changed):
+        # every callback that could be reached from the changed properties
+        pending = []
+        reach = set(changed)
+        grew = True
+        while grew:
+            grew = False
+            for out, inputs in self.callbacks:
+                if out not in pending and reach.intersection(inputs):
+                    pending.append(out)
+                    reach.add(out)
+                    grew = True
+        callbacks = dict(self.callbacks)
+        while pending:
+            out = next( o for o in pending if not set(callbacks[o]).intersection(pending) )
+            pending.remove(out)
+            inputs = callbacks[out]
+            # an upstream callback that failed or did not update does not trigger this one
+            if not changed.intersection(inputs):
+                continue
+            value = self.client.call(out, list( (i, self.values.get(i)) for i in inputs ), changed)
+            if value is not None:
+                self.values[out] = value
+                changed.add(out)
+
+
+def onOffSession(client, rand, actions, think, stop):
+    """
+    Opens the On/Off tab and drags its sliders. Returns False if the tab
+    could not be opened
+    """
+    if client.call(TAB_CALLBACK[0], [("tabs-example.value", "tab-2")], {"tabs-example.value"}) is None:
+        return False
+    page = Page(client, ONOFF_CALLBACKS, {
+        "infection-start.value" : 0.002, "incubation-days.value" : 3, "infectious-days.value" : 4,
+        "rw-slider.value" : 2.3, "rl-slider.value" : 1.3, "lockdown-slider.value" : [2, 7]
+    })
+    page.load()
+    for _ in range(actions):
+        time.sleep(rand.uniform(0, think))
+        if time.time() >= stop:
+            return True
+        slider = rand.choice(["rw-slider.value", "rl-slider.value", "lockdown-slider.value"])
+        if slider == "lockdown-slider.value":
+            # updatemode="drag": one update per step the handle passes over
+            work, cycle = page.values[slider]
+            target = rand.randint(1, 14)
+            step = 1 if target > cycle else -1
+            for c in range(cycle + step, target + step, step):
+                if time.time() >= stop:
+                    return True
+                page.set({slider : [min(work, c), c]})
+        else:
+            # updatemode="mouseup": one update when the handle is released
+            top = 7.0 if slider == "rw-slider.value" else 5.0
+            page.set({slider : round(round(rand.uniform(0, top) / 0.05) * 0.05, 2)})
+    return True
+
+
+def optimizeSession(client, rand, actions, think, stop):
+    """
+    Opens the optimize tab, then switches counties and edits model parameters.
+    Returns False if the tab could not be opened
+    """
+    tab = client.call(TAB_CALLBACK[0], [("tabs-example.value", "tab-1")], {"tabs-example.value"})
+    dropdown = findComponent(tab, "opt-county-dropdown")
+    if dropdown is None or not dropdown.get("options"):
+        return False
+    counties = list( o["value"] for o in dropdown["options"] )
+    page = Page(client, OPTIMIZE_CALLBACKS, {
+        "opt-county-dropdown.value" : dropdown.get("value", counties[0]),
+        "opt-r-value.value" : 2.5, "opt-infection-start.value" : 0.00002, "opt-incubation-days.value" : 3,
+        "opt-infectious-days.value" : 4, "opt-offset-days.value" : 0, "opt-length-days.value" : 30
+    })
+    page.load()
+    edits = {
+        "opt-r-value.value" : lambda: round(rand.uniform(0.5, 6.0), 1),
+        "opt-infection-start.value" : lambda: round(rand.uniform(0.000001, 0.0001), 7),
+        "opt-incubation-days.value" : lambda: rand.randint(1, 14),
+        "opt-infectious-days.value" : lambda: rand.randint(1, 14),
+        "opt-offset-days.value" : lambda: rand.randint(0, 30),
+        "opt-length-days.value" : lambda: rand.randint(10, 360)
+    }
+    for _ in range(actions):
+        time.sleep(rand.uniform(0, think))
+        if time.time() >= stop:
+            return True
+        if rand.random() < 0.3:
+            page.set({"opt-county-dropdown.value" : rand.choice(counties)})
+        else:
+            name = rand.choice(sorted(edits))
+            page.set({name : edits[name]()})
+    return True
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    k = max(0, min(len(values) - 1, int(math.ceil(p / 100.0 * len(values))) - 1))
+    return values[k]
+
+
+def runLevel(url, concurrency, args):
+    results = []
+    stop = time.time() + args.duration
+
+    def user(n):
+        rand = random.Random(args.seed * 1000003 + concurrency * 1009 + n)
+        client = Client(url, args.timeout, results)
+        backoff = 0.1
+        while time.time() < stop:
+            if rand.random() < args.onoff:
+                opened = onOffSession(client, rand, args.actions, args.think, stop)
+            else:
+                opened = optimizeSession(client, rand, args.actions, args.think, stop)
+            if opened:
+                backoff = 0.1
+            else:
+                # don't hot-loop on a server that is refusing connections
+                time.sleep(max(0, min(backoff, stop - time.time())))
+                backoff = min(backoff * 2, 5.0)
+
+    start = time.time()
+    threads = list( threading.Thread(target=user, args=(n,), daemon=True) for n in range(concurrency) )
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+
+    latencies = sorted( r[1] for r in results )
+    errors = sum( 1 for r in results if not r[2] )
+    return {
+        "concurrency" : concurrency,
+        "requests" : len(results),
+        # fast failures from an overloaded server are not throughput
+        "throughput" : (len(results) - errors) / elapsed,
+        "p50" : percentile(latencies, 50) * 1000,
+        "p95" : percentile(latencies, 95) * 1000,
+        "p99" : percentile(latencies, 99) * 1000,
+        "errors" : errors * 100.0 / max(1, len(results)),
+        "results" : results
+    }
+
+
+def startServer(args):
+    """
+    Start the app on synthetic data in a separate process, so it does not
+    share a GIL with the load generator. Returns (process, url)
+    """
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    env = dict(os.environ,
+        HOP_SYNTHETIC_COUNTIES=str(args.counties),
+        HOP_SYNTHETIC_DAYS=str(args.days),
+        HOP_SYNTHETIC_SEED=str(args.seed))
+    if args.workers > 0:
+        env.update(HOP_BIND="127.0.0.1:%d" % (port), HOP_WORKERS=str(args.workers))
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "index:server"]
+    else:
+        cmd = [sys.executable, "-c",
+            "from werkzeug.serving import run_simple; from index import server; "
+            "run_simple('127.0.0.1', %d, server, threaded=True)" % (port)]
+    proc = subprocess.Popen(cmd, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    url = "http://127.0.0.1:%d" % (port)
+    deadline = time.time() + args.startup
+    while True:
+        if proc.poll() is not None:
+            raise RuntimeError("App exited during startup with code %d" % (proc.returncode))
+        try:
+            urllib.request.urlopen(url + "/", timeout=1).read()
+            return proc, url
+        except Exception:
+            if time.time() > deadline:
+                proc.terminate()
+                raise RuntimeError("App did not start within %d seconds" % (args.startup))
+            time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the dashboard callbacks")
+    parser.add_argument("--url", default=None, help="running app to test; default starts one on synthetic data")
+    parser.add_argument("--workers", type=int, default=0, help="run the started app under gunicorn with this many workers")
+    parser.add_argument("--startup", type=float, default=120, help="seconds to wait for the started app")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32", help="comma separated simultaneous sessions")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per concurrency level")
+    parser.add_argument("--actions", type=int, default=10, help="user actions per session")
+    parser.add_argument("--think", type=float, default=0.5, help="max seconds between user actions")
+    parser.add_argument("--onoff", type=float, default=0.5, help="fraction of sessions on the On/Off tab")
+    parser.add_argument("--timeout", type=float, default=30, help="request timeout in seconds")
+    parser.add_argument("--counties", type=int, default=36,
+        help="synthetic counties, at most %d (started app only)" % (len(OREGON_FIPS)))
+    parser.add_argument("--days", type=int, default=60, help="synthetic report days (started app only)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--by-callback", action="store_true", help="latency breakdown per callback at the top level")
+    args = parser.parse_args()
+    if not 1 <= args.counties <= len(OREGON_FIPS):
+        parser.error("--counties must be between 1 and %d" % (len(OREGON_FIPS)))
+
+    proc, url = None, args.url
+    if url is None:
+        proc, url = startServer(args)
+    try:
+        checkDependencies(url)
+        report(url, args)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+def report(url, args):
+    levels = list( int(c) for c in args.concurrency.split(",") )
+
+    print("%6s %9s %10s %9s %9s %9s %8s" % ("users", "requests", "ok req/s", "p50 ms", "p95 ms", "p99 ms", "errors"))
+    best, first, saturated, last = 0, None, None, None
+    for c in levels:
+        last = runLevel(url, c, args)
+        print("%6d %9d %10.1f %9.1f %9.1f %9.1f %7.2f%%" % (c, last["requests"], last["throughput"],
+            last["p50"], last["p95"], last["p99"], last["errors"]))
+        if first is None:
+            first = last
+        elif saturated is None:
+            if last["throughput"] < best * 1.05:
+                # successful requests have stopped climbing with load: they are queueing
+                saturated = (c, "throughput stopped increasing")
+            elif last["errors"] > first["errors"] + 2.0:
+                saturated = (c, "error rate rose to %.2f%%" % (last["errors"]))
+            elif last["p95"] > first["p95"] * 2:
+                saturated = (c, "p95 latency more than doubled")
+        best = max(best, last["throughput"])
+
+    if saturated is not None:
+        print("Saturated at %d concurrent sessions: %s (peak %.1f ok req/s)" % (saturated[0], saturated[1], best))
+    else:
+        print("No saturation up to %d concurrent sessions" % (levels[-1]))
+
+    if args.by_callback and last is not None:
+        byName = {}
+        for name, latency, ok in last["results"]:
+            byName.setdefault(name, []).append(latency)
+        print("\nPer callback at %d sessions:" % (last["concurrency"]))
+        print("%-40s %9s %9s %9s" % ("callback", "requests", "p50 ms", "p95 ms"))
+        for name in sorted(byName):
+            latencies = sorted(byName[name])
+            print("%-40s %9d %9.1f %9.1f" % (name, len(latencies),
+                percentile(latencies, 50) * 1000, percentile(latencies, 95) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,5 @@
 
 import datetime
-import gripql
 import pandas
 
 import numpy as np
@@ -12,16 +11,11 @@ import dash_core_components as dcc
 import dash_html_components as html
 
 from app import app
+import shared_data
 
 
-conn = gripql.Connection("http://localhost:8201")
-G  = conn.graph("covid")
-
 #get Oregon Counties
-q = G.query().V().hasLabel("SummaryLocation").has(gripql.eq("province_state", "OR"))
-q = q.render(["$._gid", "$.county"])
-
-countyOptions = list( { "label" : a[1], "value" : a[0] } for a in q )
+countyOptions = list(shared_data.load().countyOptions)
 
 countyDropDown = dcc.Dropdown(
     id='opt-county-dropdown',
@@ -30,13 +24,10 @@ countyDropDown = dcc.Dropdown(
 )
 
 def getCountySummaryReports(fips):
-    q = G.query().V(fips).out("summary_reports").render(["date", "confirmed", "deaths", "recovered"])
-    return list(q)
+    return shared_data.countySummaryReports(fips)
 
 def getCountyPopulation(fips):
-    q = G.query().V(fips).out("census").has(gripql.eq("gender", None)).render(["population"])
-    population = sum(list(a[0] for a in q))
-    return population
+    return shared_data.countyPopulation(fips)
 
 # Based on model found at https://github.com/omerka-weizmann/2_day_workweek/blob/master/code.ipynb
 def SEIR_model(y,t,config):
@@ -0,0 +1,267 @@
+import os
+import gc
+import sys
+import json
+import datetime
+import resource
+import tempfile
+import collections
+import gripql
+import numpy as np
+
+# Read-only county data shared by the dashboard panels.
+#
+# The county list, geojson and report dates the layouts need are built once
+# per process by load(). When the app is served with gunicorn and
+# preload_app (see gunicorn.conf.py) that process is the master, and the
+# workers inherit it copy-on-write after the fork instead of each
+# re-querying GripQL and re-parsing the geojson.
+#
+# With HOP_SNAPSHOT=1 the county callbacks are also answered from the
+# reports and populations in that snapshot rather than queried from GripQL
+# on every request. Reports added to GripQL after startup then do not show
+# up until the app is restarted. Without it they query GripQL live.
+#
+# Only the report and population arrays stay reliably shared: their buffers
+# are never written. The dropdown options and geojson are ordinary Python
+# objects, so the pages holding them get copied into a worker as soon as it
+# touches them (reference counting writes to every object read). They are
+# small; get-geo-data.sh caches the state's counties in STATE_GEOJSON so the
+# full US geojson need not be parsed at startup.
+
+GRIPQL_URL = os.environ.get("GRIPQL_URL", "http://localhost:8201")
+GRAPH = os.environ.get("GRIPQL_GRAPH", "covid")
+STATE = "OR"
+STATE_FIPS = "41"
+GEOJSON = "geojson-counties-fips.json"
+STATE_GEOJSON = "geojson-counties-%s.json" % (STATE_FIPS)
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+CountyData = collections.namedtuple("CountyData", [
+    "countyOptions",  # tuple of {"label", "value"} dropdown options (plain objects)
+    "fipsIndex",      # fips -> row in population / offsets (plain dict)
+    "population",     # int64[n_counties]
+    "offsets",        # int64[n_counties+1], slice of the report arrays per county
+    "reportDates",    # datetime64[s][n_reports], sorted within each county
+    "reportCounts",   # int64[n_reports, 3]: confirmed, deaths, recovered
+    "geojson"         # FeatureCollection of the state's counties (plain objects)
+])
+
+_graph = None
+_graphPid = None
+_data = None
+
+
+def getGraph():
+    """
+    Return this process's GripQL graph handle. The connection is opened lazily
+    and re-opened after a fork, so workers never share the master's sockets.
+
+    If HOP_SYNTHETIC_COUNTIES is set, a SyntheticGraph with that many counties
+    is used instead of the GripQL server (HOP_SYNTHETIC_DAYS and
+    HOP_SYNTHETIC_SEED control the rest), eg for loadtest.py.
+    """
+    global _graph, _graphPid
+    if _graph is None or _graphPid != os.getpid():
+        if os.environ.get("HOP_SYNTHETIC_COUNTIES"):
+            from synthetic_graph import SyntheticGraph
+            _graph = SyntheticGraph(
+                counties=int(os.environ["HOP_SYNTHETIC_COUNTIES"]),
+                days=int(os.environ.get("HOP_SYNTHETIC_DAYS", "60")),
+                seed=int(os.environ.get("HOP_SYNTHETIC_SEED", "0"))
+            )
+        else:
+            _graph = gripql.Connection(GRIPQL_URL).graph(GRAPH)
+        _graphPid = os.getpid()
+    return _graph
+
+
+def snapshotEnabled():
+    return os.environ.get("HOP_SNAPSHOT", "0") == "1"
+
+
+def _frozen(a):
+    a.setflags(write=False)
+    return a
+
+
+def _filterGeojson():
+    with open(GEOJSON) as handle:
+        counties = json.loads(handle.read())
+    countiesSub = {"type" : "FeatureCollection", "features":[]}
+    for c in counties['features']:
+        if c['properties']['STATE'] == STATE_FIPS:
+            countiesSub['features'].append(c)
+    return countiesSub
+
+
+def writeStateGeojson():
+    """
+    Cache the state's counties from GEOJSON in STATE_GEOJSON (run by
+    get-geo-data.sh). The file is replaced atomically.
+    """
+    countiesSub = _filterGeojson()
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(STATE_GEOJSON)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as handle:
+            handle.write(json.dumps(countiesSub))
+        os.replace(tmp, STATE_GEOJSON)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _loadGeojson():
+    if os.path.exists(STATE_GEOJSON) and os.path.getmtime(STATE_GEOJSON) >= os.path.getmtime(GEOJSON):
+        with open(STATE_GEOJSON) as handle:
+            return json.loads(handle.read())
+    return _filterGeojson()
+
+
+def _build(G):
+    q = G.query().V().hasLabel("SummaryLocation").has(gripql.eq("province_state", STATE))
+    q = q.render(["$._gid", "$.county"])
+    countyOptions = tuple( { "label" : a[1], "value" : a[0] } for a in q )
+    fipsIndex = dict( (c["value"], i) for i, c in enumerate(countyOptions) )
+
+    q = G.query().V().hasLabel("SummaryLocation").has(gripql.eq("province_state", STATE)).as_("a")
+    q = q.out("census").has(gripql.eq("gender", None)).as_("c")
+    q = q.render(["$a._gid", "$c.population"])
+    population = np.zeros(len(countyOptions), dtype=np.int64)
+    for fips, p in q:
+        if fips in fipsIndex and p is not None:
+            population[fipsIndex[fips]] += p
+
+    q = G.query().V().hasLabel("SummaryLocation").has(gripql.eq("province_state", STATE)).as_("a")
+    q = q.out("summary_reports").as_("b")
+    q = q.render(["$a._gid", "$b.date", "$b.confirmed", "$b.deaths", "$b.recovered"])
+    county, dates, counts = [], [], []
+    skipped = collections.Counter()
+    for fips, date, confirmed, deaths, recovered in q:
+        if fips not in fipsIndex:
+            continue
+        try:
+            d = datetime.datetime.strptime(date, DATE_FORMAT)
+        except (TypeError, ValueError):
+            skipped[fips] += 1
+            continue
+        county.append(fipsIndex[fips])
+        dates.append(d)
+        # missing counts are stored as 0
+        counts.append((int(confirmed or 0), int(deaths or 0), int(recovered or 0)))
+    for fips, n in sorted(skipped.items()):
+        print("Skipped %d %s reports not dated %s" % (n, fips, DATE_FORMAT))
+    county = np.array(county, dtype=np.int64)
+    dates = np.array(dates, dtype="datetime64[s]")
+    counts = np.array(counts, dtype=np.int64).reshape(-1, 3)
+
+    # sort by county then date, keeping the last report seen for a duplicated date
+    order = np.lexsort((np.arange(len(county)), dates, county))
+    county, dates, counts = county[order], dates[order], counts[order]
+    keep = np.ones(len(county), dtype=bool)
+    keep[:-1] = (county[:-1] != county[1:]) | (dates[:-1] != dates[1:])
+    county, dates, counts = county[keep], dates[keep], counts[keep]
+    offsets = np.searchsorted(county, np.arange(len(countyOptions)+1))
+
+    return CountyData(
+        countyOptions=countyOptions,
+        fipsIndex=fipsIndex,
+        population=_frozen(population),
+        offsets=_frozen(offsets.astype(np.int64)),
+        reportDates=_frozen(dates),
+        reportCounts=_frozen(counts),
+        geojson=_loadGeojson()
+    )
+
+
+def load():
+    """
+    Build the shared county data for this process, if it has not been built
+    already, and return it. It is not refreshed afterwards.
+    """
+    global _data
+    if _data is None:
+        _data = _build(getGraph())
+    return _data
+
+
+def freeze():
+    """
+    Move everything allocated so far out of the garbage collector's reach.
+    Call in the master right before forking: otherwise the first collection
+    in each worker touches every shared object and un-shares its page.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def countySummaryReports(fips):
+    """
+    Summary reports for a county, as [date, confirmed, deaths, recovered]
+    rows in the same layout the GripQL render query returns. Read from the
+    snapshot if HOP_SNAPSHOT=1, otherwise queried from GripQL.
+    """
+    if not snapshotEnabled():
+        q = getGraph().query().V(fips).out("summary_reports").render(["date", "confirmed", "deaths", "recovered"])
+        return list(q)
+    data = load()
+    i = data.fipsIndex.get(fips)
+    if i is None:
+        return []
+    start, end = data.offsets[i], data.offsets[i+1]
+    dates = np.datetime_as_string(data.reportDates[start:end], unit="s")
+    return list(
+        [d.replace("T", " ")] + c
+        for d, c in zip(dates, data.reportCounts[start:end].tolist())
+    )
+
+
+def countyPopulation(fips):
+    if not snapshotEnabled():
+        q = getGraph().query().V(fips).out("census").has(gripql.eq("gender", None)).render(["population"])
+        return sum(list(a[0] for a in q))
+    data = load()
+    i = data.fipsIndex.get(fips)
+    if i is None:
+        return 0
+    return int(data.population[i])
+
+
+def reportDates():
+    """
+    Sorted distinct report dates across all counties, as datetimes
+    """
+    return list( d.item() for d in np.unique(load().reportDates) )
+
+
+def memoryUsage(pid=None):
+    """
+    Resident memory of a process (default: this one), in kB, from
+    /proc/<pid>/smaps_rollup. 'pss' and 'private' show how much of 'rss' is
+    still shared with the master and sibling workers. Where that can not be
+    read, only 'maxrss' (peak RSS of this process, in the platform's
+    ru_maxrss unit: kB on Linux, bytes on macOS) is given, and nothing for
+    another process.
+    """
+    isSelf = pid is None or pid == os.getpid()
+    out = {"pid" : os.getpid() if pid is None else pid}
+    try:
+        with open("/proc/%d/smaps_rollup" % (out["pid"])) as handle:
+            fields = {}
+            for line in handle:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+        out["rss"] = fields["Rss"]
+        out["pss"] = fields["Pss"]
+        out["shared"] = fields["Shared_Clean"] + fields["Shared_Dirty"]
+        out["private"] = fields["Private_Clean"] + fields["Private_Dirty"]
+    except (IOError, KeyError):
+        if isSelf:
+            out["maxrss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return out
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ["--filter-geojson"]:
+        writeStateGeojson()
@@ -0,0 +1,130 @@
+import math
+import random
+import datetime
+
+# In-process stand-in for the GripQL "covid" graph, seeded with synthetic
+# counties. Supports just the traversal steps the dashboard uses:
+# V, hasLabel, has(eq), as_, out and render.
+
+# Oregon county fips codes, so the synthetic counties line up with the geojson
+OREGON_FIPS = list( "41%03d" % (i) for i in range(1, 72, 2) )
+
+
+def _condition(cond):
+    # gripql.eq(key, value) -> {"condition": {"key": .., "value": .., "condition": "EQ"}}
+    c = cond.get("condition", cond)
+    if c.get("condition", "EQ") != "EQ":
+        raise ValueError("Only eq conditions are supported: %s" % (cond))
+    return c["key"], c.get("value")
+
+
+class Query:
+    def __init__(self, graph, steps=()):
+        self.graph = graph
+        self.steps = list(steps)
+
+    def _add(self, *step):
+        return Query(self.graph, self.steps + [step])
+
+    def V(self, ids=None):
+        if isinstance(ids, str):
+            ids = [ids]
+        return self._add("V", ids)
+
+    def hasLabel(self, label):
+        return self._add("hasLabel", label)
+
+    def has(self, cond):
+        return self._add("has", _condition(cond))
+
+    def as_(self, name):
+        return self._add("as", name)
+
+    def out(self, label):
+        return self._add("out", label)
+
+    def render(self, template):
+        return self._add("render", template)
+
+    def _render(self, template, cur, marks):
+        if isinstance(template, list):
+            return list( self._render(t, cur, marks) for t in template )
+        if not template.startswith("$"):
+            template = "$." + template
+        name, _, field = template[1:].partition(".")
+        gid = marks[name] if name else cur
+        if field == "_gid":
+            return gid
+        return self.graph.vertices[gid][1].get(field)
+
+    def __iter__(self):
+        g = self.graph
+        paths = []
+        render = None
+        for step in self.steps:
+            op = step[0]
+            if op == "V":
+                ids = step[1] if step[1] is not None else g.vertices.keys()
+                paths = list( (gid, {}) for gid in ids if gid in g.vertices )
+            elif op == "hasLabel":
+                paths = list( p for p in paths if g.vertices[p[0]][0] == step[1] )
+            elif op == "has":
+                key, value = step[1]
+                paths = list( p for p in paths if g.vertices[p[0]][1].get(key) == value )
+            elif op == "as":
+                paths = list( (gid, dict(marks, **{step[1]: gid})) for gid, marks in paths )
+            elif op == "out":
+                paths = list( (dst, marks) for gid, marks in paths for dst in g.edges.get((gid, step[1]), []) )
+            elif op == "render":
+                render = step[1]
+        for gid, marks in paths:
+            if render is None:
+                yield g.vertices[gid][1]
+            else:
+                yield self._render(render, gid, marks)
+
+
+class SyntheticGraph:
+    """
+    @counties: number of counties to generate (at most 36, one per Oregon fips)
+    @days: number of daily summary reports per county
+    @seed: random seed, so runs are repeatable
+    """
+    def __init__(self, counties=36, days=60, seed=0):
+        if not 1 <= counties <= len(OREGON_FIPS):
+            raise ValueError("counties must be between 1 and %d" % (len(OREGON_FIPS)))
+        rand = random.Random(seed)
+        self.vertices = {}
+        self.edges = {}
+        start = datetime.datetime(2020, 3, 1, 23, 59, 0)
+        for fips in OREGON_FIPS[:counties]:
+            self._vertex(fips, "SummaryLocation", {
+                "province_state" : "OR", "county" : "County %s" % (fips)
+            })
+            population = rand.randint(2000, 800000)
+            for gender in (None, "male", "female"):
+                gid = "%s:census:%s" % (fips, gender)
+                share = 1.0 if gender is None else 0.5
+                self._vertex(gid, "Census", {"gender" : gender, "population" : int(population * share)})
+                self._edge(fips, "census", gid)
+            rate, midpoint = rand.uniform(0.05, 0.2), rand.uniform(days / 3, days)
+            final = population * rand.uniform(0.0005, 0.01)
+            for d in range(days):
+                gid = "%s:report:%d" % (fips, d)
+                confirmed = int(final / (1 + math.exp(-rate * (d - midpoint))))
+                self._vertex(gid, "SummaryReport", {
+                    "date" : (start + datetime.timedelta(days=d)).strftime("%Y-%m-%d %H:%M:%S"),
+                    "confirmed" : confirmed,
+                    "deaths" : int(confirmed * 0.02),
+                    "recovered" : int(confirmed * 0.5)
+                })
+                self._edge(fips, "summary_reports", gid)
+
+    def _vertex(self, gid, label, data):
+        self.vertices[gid] = (label, data)
+
+    def _edge(self, src, label, dst):
+        self.edges.setdefault((src, label), []).append(dst)
+
+    def query(self):
+        return Query(self)
@@ -0,0 +1,63 @@
+import os
+import pytest
+import shared_data
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    """
+    Synthetic graph with a duplicated report date and a missing count,
+    loaded into a fresh shared_data snapshot
+    """
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    monkeypatch.setenv("HOP_SYNTHETIC_COUNTIES", "4")
+    monkeypatch.setenv("HOP_SYNTHETIC_DAYS", "5")
+    monkeypatch.setenv("HOP_SNAPSHOT", "1")
+    monkeypatch.setattr(shared_data, "_graph", None)
+    monkeypatch.setattr(shared_data, "_data", None)
+
+    G = shared_data.getGraph()
+    # a later report for an existing date replaces the earlier one
+    dup = dict(G.vertices["41003:report:2"][1], confirmed=12345)
+    G._vertex("41003:report:dup", "SummaryReport", dup)
+    G._edge("41003", "summary_reports", "41003:report:dup")
+    G.vertices["41005:report:1"][1]["recovered"] = None
+    return G
+
+
+def expectedReports(G, fips):
+    q = G.query().V(fips).out("summary_reports").render(["date", "confirmed", "deaths", "recovered"])
+    byDate = {}
+    for date, confirmed, deaths, recovered in q:
+        byDate[date] = [date, confirmed or 0, deaths or 0, recovered or 0]
+    return list( byDate[d] for d in sorted(byDate) )
+
+
+def expectedPopulation(G, fips):
+    q = G.query().V(fips).out("census").has(shared_data.gripql.eq("gender", None)).render(["population"])
+    return sum( a[0] for a in q )
+
+
+def test_snapshot_matches_graph(graph):
+    fipsList = list( c["value"] for c in shared_data.load().countyOptions )
+    assert len(fipsList) == 4
+    for fips in fipsList:
+        assert shared_data.countySummaryReports(fips) == expectedReports(graph, fips)
+        assert shared_data.countyPopulation(fips) == expectedPopulation(graph, fips)
+
+    assert len(shared_data.countySummaryReports("41003")) == 5
+    assert shared_data.countySummaryReports("41003")[2][1] == 12345
+    assert shared_data.countySummaryReports("41005")[1][3] == 0
+
+
+def test_unknown_fips(graph):
+    assert shared_data.countySummaryReports("99999") == []
+    assert shared_data.countyPopulation("99999") == 0
+
+
+def test_live_queries(graph, monkeypatch):
+    monkeypatch.setenv("HOP_SNAPSHOT", "0")
+    assert shared_data.countySummaryReports("41001") == list(
+        graph.query().V("41001").out("summary_reports").render(["date", "confirmed", "deaths", "recovered"])
+    )
+    assert shared_data.countyPopulation("41001") == expectedPopulation(graph, "41001")